@@ -1,3 +1,11 @@
+import contextlib
+import glob
+import hashlib
+import inspect
+import os
+import tempfile
+
+import joblib
 import streamlit as st
 import pandas as pd
 import template as t
@@ -6,46 +14,121 @@ from recommender import ContentBasedRecommender
 st.set_page_config(page_title="Book Recommender", layout="wide", initial_sidebar_state="expanded")
 
 # --- DATA LOADING & CACHING ---
+BOOKS_CSV = 'data/BX-Books.csv'
+BOOKS_PARQUET = 'data/BX-Books.parquet'
+RATINGS_CSV = 'data/BX-Book-Ratings-Subset.csv'
+CACHE_DIR = 'cache'
+
+# Only the columns the app actually uses
+BOOK_COLUMNS = ['ISBN', 'Book-Title', 'Book-Author', 'Publisher', 'Year-Of-Publication', 'Image-URL-M']
+RATING_COLUMNS = ['ISBN', 'Book-Rating']
+
+def write_atomically(path, write):
+    # Write to a temporary file next to `path` and move it into place, so a killed process or
+    # a concurrent writer never leaves a truncated cache file behind
+    try:
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + '.', suffix='.tmp')
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+        return True
+    except OSError:
+        # Read-only deployments just skip the disk cache
+        return False
+
+def read_books():
+    # Parse the CSV once and keep a parquet copy for subsequent starts
+    if os.path.exists(BOOKS_PARQUET) and os.path.getmtime(BOOKS_PARQUET) >= os.path.getmtime(BOOKS_CSV):
+        try:
+            books = pd.read_parquet(BOOKS_PARQUET, dtype_backend='pyarrow')
+            # A copy written with a different column selection is stale
+            if set(books.columns) == set(BOOK_COLUMNS):
+                return books
+        except Exception:
+            # Corrupt file: re-parse the CSV and overwrite it
+            pass
+
+    books = pd.read_csv(
+        BOOKS_CSV, sep=';', encoding='latin-1', on_bad_lines='skip',
+        engine='pyarrow', dtype_backend='pyarrow', usecols=BOOK_COLUMNS
+    )
+    write_atomically(BOOKS_PARQUET, lambda path: books.to_parquet(path, index=False))
+    return books
+
 @st.cache_resource
 def load_data():
     try:
         # Load books
-        books = pd.read_csv('data/BX-Books.csv', sep=';', encoding='latin-1', on_bad_lines='skip', low_memory=False)
+        books = read_books()
         
         # Load ratings for Top 50 functionality
-        ratings = pd.read_csv('data/BX-Book-Ratings-Subset.csv', sep=';', encoding='latin-1', on_bad_lines='skip', low_memory=False)
+        ratings = pd.read_csv(
+            RATINGS_CSV, sep=';', encoding='latin-1', on_bad_lines='skip',
+            engine='pyarrow', dtype_backend='pyarrow', usecols=RATING_COLUMNS, dtype={'Book-Rating': 'int8'}
+        )
+        # Grouping on small category codes is much cheaper than hashing ISBN strings
+        ratings['ISBN'] = ratings['ISBN'].astype('category')
         
         return books, ratings
     except FileNotFoundError:
         st.error("Data files not found. Please ensure 'data/BX-Books.csv' and 'data/BX-Book-Ratings-Subset.csv' exist.")
         return None, None
 
+def prune_cache(pattern, keep):
+    # Remove cache files left behind by older code or data versions
+    for path in glob.glob(os.path.join(CACHE_DIR, pattern)):
+        if os.path.abspath(path) != os.path.abspath(keep):
+            with contextlib.suppress(OSError):
+                os.remove(path)
+
+def model_cache_key(data):
+    # Content hash of every column the model stores (not just the text it is trained on),
+    # the loaded column layout and the recommender source, so no data or code change loads a stale model
+    hasher = hashlib.md5(pd.util.hash_pandas_object(data, index=False).values)
+    hasher.update(repr(BOOK_COLUMNS).encode())
+    with open(inspect.getsourcefile(ContentBasedRecommender), 'rb') as f:
+        hasher.update(f.read())
+    return hasher.hexdigest()
+
 @st.cache_resource
 def load_recommender(data):
     # We use a subset of data for performance in this demo if the dataset is huge
     # For full project, use full data or better hardware/optimization
     # Taking top 5000 books for speed and memory efficiency in Cloud environment
-    if len(data) > 5000:
-        data_subset = data.head(5000).copy()
-    else:
-        data_subset = data.copy()
+    # load_data() already keeps only BOOK_COLUMNS, and the recommender replaces columns rather
+    # than writing into them, so a shallow copy is enough to keep the shared frame untouched
+    data_subset = data.iloc[:5000].copy(deep=False)
+
+    # Reuse a model trained on identical data (and recommender code) in a previous process
+    model_path = os.path.join(CACHE_DIR, f"model_{model_cache_key(data_subset)}.joblib")
+    if os.path.exists(model_path):
+        try:
+            return joblib.load(model_path)
+        except Exception:
+            # Corrupt file, or pickled by incompatible library versions: retrain and overwrite it
+            pass
         
     model = ContentBasedRecommender(data_subset)
     model.preprocess()
     model.train()
+
+    if write_atomically(model_path, lambda path: joblib.dump(model, path, compress=3)):
+        prune_cache('model_*.joblib', keep=model_path)
     return model
 
-@st.cache_data
-def get_top_50_books(books_df, ratings_df):
-    # Aggregating ratings
-    rating_counts = ratings_df.groupby('ISBN').count()['Book-Rating'].reset_index()
-    rating_counts.rename(columns={'Book-Rating': 'num_ratings'}, inplace=True)
-    
-    avg_rating = ratings_df.groupby('ISBN').mean(numeric_only=True)['Book-Rating'].reset_index()
-    avg_rating.rename(columns={'Book-Rating': 'avg_rating'}, inplace=True)
-    
-    # Merging
-    popular_df = rating_counts.merge(avg_rating, on='ISBN')
+def aggregate_top_50_books(books_df, ratings_df):
+    # Aggregating ratings (count and mean in a single groupby pass)
+    popular_df = (
+        ratings_df.groupby('ISBN', observed=True, sort=False)['Book-Rating']
+        .agg(num_ratings='count', avg_rating='mean')
+        .reset_index()
+    )
     
     # Filter for statistically significant ratings (e.g., > 50 votes)
     # Adjust threshold if data is sparse, let's try 50 first, if empty we lower it
@@ -59,6 +142,42 @@ def get_top_50_books(books_df, ratings_df):
     
     return popular_df
 
+def top_50_cache_key():
+    # The aggregation code, the loaded book columns and the source files' timestamps,
+    # so changing any of them never serves a stale Top 50
+    hasher = hashlib.md5(inspect.getsource(aggregate_top_50_books).encode())
+    hasher.update(repr(BOOK_COLUMNS).encode())
+    for path in (BOOKS_CSV, RATINGS_CSV):
+        hasher.update(str(os.path.getmtime(path)).encode())
+    return hasher.hexdigest()
+
+# The result is read-only, so cache_resource shares one object across sessions
+# instead of copying (and pickling) it on every hit like cache_data would.
+# The leading underscores tell Streamlit not to hash the large input frames,
+# which come from the cached load_data() and never change within a process.
+@st.cache_resource
+def get_top_50_books(_books_df, _ratings_df):
+    # Reuse the result from a previous process
+    top_50_path = os.path.join(CACHE_DIR, f"top50_{top_50_cache_key()}.parquet")
+    if os.path.exists(top_50_path):
+        try:
+            return pd.read_parquet(top_50_path)
+        except Exception:
+            # Corrupt file: recompute and overwrite it
+            pass
+
+    popular_df = aggregate_top_50_books(_books_df, _ratings_df)
+
+    if write_atomically(top_50_path, popular_df.to_parquet):
+        prune_cache('top50_*.parquet', keep=top_50_path)
+    
+    return popular_df
+
+# Built once per process from the shared Top 50 result, so reruns just re-send the string
+@st.cache_resource
+def get_top_50_html(_books_df, _ratings_df):
+    return t.top_50_html(get_top_50_books(_books_df, _ratings_df))
+
 # --- PAGE FUNCTIONS ---
 
 def page_recommend_books(df_books):
@@ -71,10 +190,9 @@ def page_recommend_books(df_books):
 
     # User Input
     # sophisticated autocomplete
-    all_titles = recommender.books_df['Book-Title'].unique()
     selected_book = st.selectbox(
         "Type or select a book you like:",
-        options=[""] + list(all_titles),
+        options=recommender.all_titles,
         index=0,
         help="Start typing to search for a book title."
     )
@@ -84,34 +202,22 @@ def page_recommend_books(df_books):
         
         # Display selected book info
         try:
-            original_book_info = recommender.books_df[recommender.books_df['Book-Title'] == selected_book].iloc[0]
+            # Duplicate titles match several rows, show the first one
+            original_book_info = recommender.books_by_title.loc[[selected_book]].head(1)
             
             st.write("---")
-            st.markdown(
-                f"""
-                <div class="book-card" style="flex-direction: row; align-items: flex-start; text-align: left; padding: 25px; margin-bottom: 30px; gap: 20px;">
-                    <img src="{original_book_info['Image-URL-M']}" style="width: 140px; height: 210px; object-fit: cover; box-shadow: 0 5px 15px rgba(0,0,0,0.5);">
-                    <div style="flex: 1;">
-                        <h3 style="margin: 0 0 10px 0; font-size: 1.8rem; line-height: 1.2;">{original_book_info['Book-Title']}</h3>
-                        <p style="color: #cbd5e1; font-size: 1.1rem; margin-bottom: 5px;"><strong>Author:</strong> {original_book_info['Book-Author']}</p>
-                        <p style="color: #94a3b8; font-size: 0.95rem; margin-bottom: 5px;"><strong>Publisher:</strong> {original_book_info['Publisher']}</p>
-                        <p style="color: #94a3b8; font-size: 0.95rem;"><strong>Year:</strong> {original_book_info['Year-Of-Publication']}</p>
-                    </div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+            st.markdown(t.selected_book_html(original_book_info), unsafe_allow_html=True)
 
             st.write("### Recommended Books:")
             
             recommendations = recommender.recommend(selected_book, top_n=5)
             
             if not isinstance(recommendations, list) and not recommendations.empty:
-                t.recommendations(recommendations)
+                t.recommendations(recommendations, key='similar')
             else:
                 st.warning("No recommendations found or book not in index.")
                 
-        except IndexError:
+        except (KeyError, IndexError):
             st.error("Error retrieving book details.")
 
     # --- GENRE BROWSING ---
@@ -127,7 +233,7 @@ def page_recommend_books(df_books):
             genre_predictions = recommender.get_books_by_genre(selected_genre, top_n=10)
             
         if not genre_predictions.empty:
-            t.recommendations(genre_predictions)
+            t.recommendations(genre_predictions, key='genre')
         else:
             st.info(f"No books found matching criteria for {selected_genre} in this subset of data.")
 
@@ -142,35 +248,8 @@ def page_top_50(df_books, df_ratings):
         st.warning("Not enough rating data to calculate Top 50 (threshold: 50 votes).")
         return
 
-    # Display in a grid with dividers
-    cols_per_row = 4
-    books = top_books.reset_index().to_dict('records')
-    
-    # Chunk the books into rows
-    rows = [books[i:i + cols_per_row] for i in range(0, len(books), cols_per_row)]
-    
-    for i, row_items in enumerate(rows):
-        cols = st.columns(cols_per_row)
-        
-        for idx, book in enumerate(row_items):
-            with cols[idx]:
-                st.markdown(
-                    f"""
-                    <div class="book-card">
-                        <img src="{book['Image-URL-M']}" style="width: 120px; height: 170px; object-fit: cover;">
-                        <div class="book-title" title="{book['Book-Title']}">{book['Book-Title']}</div>
-                        <div class="book-author">{book['Book-Author']}</div>
-                        <div class="book-stats">
-                            ★ {book['avg_rating']:.1f} | {book['num_ratings']} Votes
-                        </div>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
-        
-        # Add a divider after each row, except the last one
-        if i < len(rows) - 1:
-            st.markdown("---")
+    # Display in a CSS grid emitted as a single markdown element
+    st.markdown(get_top_50_html(df_books, df_ratings), unsafe_allow_html=True)
 
 def page_about():
     st.title("About Project")
@@ -196,45 +275,12 @@ def page_about():
     )
 
 
-# --- MAIN APP LOGIC ---
-
-def main():
-    # Sidebar Navigation
-    st.sidebar.title("Book Recommender")
-    
-    page = st.sidebar.radio(
-        "Navigation",
-        ["Top 50 Books", "Recommend Books", "About"],
-        index=1 # Default to Recommender as per implicit user flow, or change if needed
-    )
-    
-    st.sidebar.markdown("---")
-    st.sidebar.info("Navigate through the app using the menu above.")
-
-    # Dark Mode Toggle
-    dark_mode = st.sidebar.checkbox("Night Vision Mode", value=False)
-    
-    # Load Data
-    with st.spinner('Loading library...'):
-        df_books, df_ratings = load_data()
-    
-    if df_books is None:
-        return
-
-    # Routing
-    if page == "Top 50 Books":
-        if df_ratings is not None:
-            page_top_50(df_books, df_ratings)
-        else:
-            st.error("Ratings data is missing, cannot display Top 50.")
-            
-    elif page == "Recommend Books":
-        page_recommend_books(df_books)
-        
-    elif page == "About":
-        page_about()
+# --- CUSTOM CSS ---
 
-    # --- CUSTOM CSS ---
+# The stylesheet only depends on the theme, so build each variant once per process
+# instead of re-formatting it on every rerun
+@st.cache_resource
+def css_for(dark_mode: bool) -> str:
     # Theme Variables
     if dark_mode:
         # Premium Dark Mode (Glassmorphism + Deep Ocean)
@@ -282,8 +328,7 @@ def main():
         }
         """
     
-    st.markdown(
-        f"""
+    return f"""
         <style>
         @import url('https://fonts.googleapis.com/css2?family=Outfit:wght@300;400;600;700&display=swap');
 
@@ -378,6 +423,40 @@ def main():
              /* This is usually the circle container */
         }}
 
+        /* TOP 50 GRID */
+        .top50-grid {{
+            display: grid;
+            grid-template-columns: repeat(4, 1fr);
+            gap: 20px;
+        }}
+        .top50-grid .book-card img, .top50-grid .book-cover-placeholder {{
+            width: 120px;
+            height: 170px;
+            object-fit: cover;
+        }}
+
+        /* RECOMMENDATION GRID */
+        .recommendation-grid {{
+            display: grid;
+            grid-template-columns: repeat(5, 1fr);
+            gap: 12px;
+        }}
+        .recommendation-grid .book-card img, .recommendation-grid .book-cover-placeholder {{
+            width: 100%;
+            height: 200px;
+            object-fit: cover;
+        }}
+        .book-cover-placeholder {{
+            display: flex;
+            align-items: center;
+            justify-content: center;
+            border-radius: 8px;
+            margin-bottom: 12px;
+            background: var(--input-bg);
+            color: var(--text-color);
+            opacity: 0.6;
+        }}
+
         /* CARDS (Used in both Top 50 and Recommendations) */
         .book-card {{
             background: var(--card-bg);
@@ -436,9 +515,47 @@ def main():
             border-radius: 20px;
         }}
         </style>
-        """,
-        unsafe_allow_html=True
+        """
+
+
+# --- MAIN APP LOGIC ---
+
+def main():
+    # Sidebar Navigation
+    st.sidebar.title("Book Recommender")
+    
+    page = st.sidebar.radio(
+        "Navigation",
+        ["Top 50 Books", "Recommend Books", "About"],
+        index=1 # Default to Recommender as per implicit user flow, or change if needed
     )
+    
+    st.sidebar.markdown("---")
+    st.sidebar.info("Navigate through the app using the menu above.")
+
+    # Dark Mode Toggle
+    dark_mode = st.sidebar.checkbox("Night Vision Mode", value=False)
+    st.markdown(css_for(dark_mode), unsafe_allow_html=True)
+    
+    # Load Data
+    with st.spinner('Loading library...'):
+        df_books, df_ratings = load_data()
+    
+    if df_books is None:
+        return
+
+    # Routing
+    if page == "Top 50 Books":
+        if df_ratings is not None:
+            page_top_50(df_books, df_ratings)
+        else:
+            st.error("Ratings data is missing, cannot display Top 50.")
+            
+    elif page == "Recommend Books":
+        page_recommend_books(df_books)
+        
+    elif page == "About":
+        page_about()
 
     # Footer
     st.write("---")
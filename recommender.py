@@ -1,40 +1,75 @@
+import numpy as np
 import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import linear_kernel
+
+# Keywords used to simulate genres by searching Book-Title
+GENRE_KEYWORDS = {
+    'Fantasy': ['magic', 'wizard', 'dragon', 'fantasy', 'ring', 'harry potter', 'lord of the rings', 'hobbit', 'witch'],
+    'Mystery': ['mystery', 'detective', 'murder', 'crime', 'sherlock', 'poirot', 'investigation', 'thriller'],
+    'Romance': ['love', 'romance', 'kiss', 'wedding', 'bride', 'heart'],
+    'Sci-Fi': ['space', 'planet', 'alien', 'galaxy', 'star wars', 'scifi', 'sci-fi', 'robot', 'future'],
+    'Horror': ['horror', 'ghost', 'vampire', 'zombie', 'scary', 'haunted', 'stephen king']
+}
 
 class ContentBasedRecommender:
     def __init__(self, books_df):
         self.books_df = books_df
         # Ensure data types are correct
-        self.books_df['Book-Title'] = self.books_df['Book-Title'].astype(str)
-        self.books_df['Book-Author'] = self.books_df['Book-Author'].astype(str)
-        self.books_df['Publisher'] = self.books_df['Publisher'].astype(str)
+        # Arrow-backed strings keep the vectorized .str operations below off the per-row Python path
+        # (plain 'string' means Python object storage on pandas 2.x)
+        text_cols = ['Book-Title', 'Book-Author', 'Publisher']
+        self.books_df[text_cols] = self.books_df[text_cols].fillna('').astype('string[pyarrow]')
         
-        self.cosine_sim = None
+        self.tfidf_matrix = None
         self.indices = None
 
+        # Columns the UI renders for a book; results are narrowed to these.
+        # Positions let results be taken in one iloc call, without a full-width intermediate frame
+        self._render_cols = ['Book-Title', 'Book-Author', 'Publisher', 'Year-Of-Publication', 'Image-URL-M', 'ISBN']
+        self._render_col_positions = [self.books_df.columns.get_loc(c) for c in self._render_cols]
+        self.books_by_title = None
+        self.all_titles = None
+
+        # Genres are static, so match each genre's keywords against the titles once
+        # (regex pattern matching any of the keywords case-insensitively)
+        # and keep the row positions of the matches for every genre request
+        self._genre_positions = {
+            genre: np.flatnonzero(
+                self.books_df['Book-Title'].str.contains('|'.join(terms), case=False, na=False).to_numpy(dtype=bool)
+            )
+            for genre, terms in GENRE_KEYWORDS.items()
+        }
+
     def preprocess(self):
         # Create a 'features' column by combining relevant text fields
-        # usage of fillna to handle potentially missing values although we cast to str in init
-        self.books_df['features'] = (
-            self.books_df['Book-Title'] + " " + 
-            self.books_df['Book-Author'] + " " + 
-            self.books_df['Publisher']
-        )
-        # Clean up the features (basic example)
-        self.books_df['features'] = self.books_df['features'].apply(lambda x: x.lower())
+        # and clean it up (basic example) in a single vectorized pass
+        self.books_df['features'] = self.books_df['Book-Title'].str.cat(
+            [self.books_df['Book-Author'], self.books_df['Publisher']], sep=' ', na_rep=''
+        ).str.lower()
 
     def train(self):
         # Initialize TfidfVectorizer
-        tfidf = TfidfVectorizer(stop_words='english')
+        # Dropping very rare/very common terms and capping the vocabulary keeps the matrix small,
+        # and float32 halves its memory footprint
+        tfidf = TfidfVectorizer(
+            stop_words='english',
+            min_df=2,
+            max_df=0.9,
+            max_features=20000,
+            sublinear_tf=True,
+            dtype=np.float32
+        )
         
         # Construct the TF-IDF matrix
-        tfidf_matrix = tfidf.fit_transform(self.books_df['features'])
-        
-        # Compute the cosine similarity matrix
-        # linear_kernel is equivalent to cosine_similarity for normalized vectors (TF-IDF is normalized)
-        # and is faster
-        self.cosine_sim = linear_kernel(tfidf_matrix, tfidf_matrix)
+        # Rows are L2-normalized, so a dot product between two rows is their cosine similarity.
+        # We keep the sparse matrix instead of a dense N x N similarity matrix and
+        # compute the single row we need at query time.
+        try:
+            self.tfidf_matrix = tfidf.fit_transform(self.books_df['features'])
+        except ValueError:
+            # Small catalogs can have every term pruned: keep all of them instead
+            tfidf.set_params(min_df=1, max_df=1.0)
+            self.tfidf_matrix = tfidf.fit_transform(self.books_df['features'])
         
         # Construct a reverse map of indices and book titles
         # We use the first occurrence of a book title to map to its index
@@ -42,6 +77,13 @@ class ContentBasedRecommender:
         # but users search by title.
         self.indices = pd.Series(self.books_df.index, index=self.books_df['Book-Title']).drop_duplicates()
 
+        # Title-indexed view of the books for constant-time metadata lookups
+        self.books_by_title = self.books_df.set_index('Book-Title', drop=False)
+
+        # Sorted title options for the search box, with a leading blank entry for "no selection".
+        # A tuple, so every rerun hands the widget the same immutable options object
+        self.all_titles = ("", *sorted(self.books_df['Book-Title'].drop_duplicates().tolist()))
+
     def recommend(self, title, top_n=5):
         # Check if book exists
         if title not in self.indices:
@@ -55,44 +97,31 @@ class ContentBasedRecommender:
              idx = idx.iloc[0]
 
         # Get the pairwsie similarity scores of all books with that book
-        sim_scores = list(enumerate(self.cosine_sim[idx]))
+        sims = np.asarray((self.tfidf_matrix[idx] @ self.tfidf_matrix.T).todense()).ravel()
 
-        # Sort the books based on the similarity scores
-        sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
+        # Exclude the book itself
+        sims[idx] = -np.inf
 
-        # Get the scores of the 10 most similar books
-        # We start from 1 because 0 is the book itself
-        sim_scores = sim_scores[1:top_n+1]
+        # Partially sort to get the top_n highest scores, then order just those few
+        k = min(top_n, len(sims) - 1)
+        book_indices = np.argpartition(sims, -k)[len(sims) - k:]
+        book_indices = book_indices[np.argsort(-sims[book_indices])]
 
-        # Get the book indices
-        book_indices = [i[0] for i in sim_scores]
+        # Books sharing no terms with this one (e.g. all its terms were pruned) are not similar
+        book_indices = book_indices[sims[book_indices] > 0]
 
         # Return the top_n most similar books
-        return self.books_df.iloc[book_indices]
+        return self.books_df.iloc[book_indices, self._render_col_positions]
 
     def get_books_by_genre(self, genre, top_n=10):
         """
         Simulate genre filtering by searching keywords in Book-Title.
         """
-        keywords = {
-            'Fantasy': ['magic', 'wizard', 'dragon', 'fantasy', 'ring', 'harry potter', 'lord of the rings', 'hobbit', 'witch'],
-            'Mystery': ['mystery', 'detective', 'murder', 'crime', 'sherlock', 'poirot', 'investigation', 'thriller'],
-            'Romance': ['love', 'romance', 'kiss', 'wedding', 'bride', 'heart'],
-            'Sci-Fi': ['space', 'planet', 'alien', 'galaxy', 'star wars', 'scifi', 'sci-fi', 'robot', 'future'],
-            'Horror': ['horror', 'ghost', 'vampire', 'zombie', 'scary', 'haunted', 'stephen king']
-        }
-        
-        if genre not in keywords:
+        if genre not in self._genre_positions:
             return pd.DataFrame() # Return empty if genre not defined
             
-        search_terms = keywords[genre]
-        # Regex pattern to match any of the keywords case-insensitively
-        pattern = '|'.join(search_terms)
-        
-        # Filter books where title contains the pattern
-        filtered_books = self.books_df[self.books_df['Book-Title'].str.contains(pattern, case=False, na=False)]
-        
-        # Return a random sample if we have more than top_n, else return all we found
-        if len(filtered_books) > top_n:
-            return filtered_books.sample(top_n)
-        return filtered_books
+        # Pick a random sample of the matching rows (all of them if we have at most top_n),
+        # so only the picked rows are materialized
+        positions = self._genre_positions[genre]
+        picked = np.random.choice(positions, size=min(top_n, len(positions)), replace=False)
+        return self.books_df.iloc[picked, self._render_col_positions]
@@ -1,42 +1,118 @@
 import streamlit as st
-from random import random
 
 # set episode session state
 # Helper functions for UI
 # Helper functions for UI
-def tile_item(column, item):
-    with column:
-        st.markdown(
-            f"""
-            <div class="book-card">
-                <img src="{item['Image-URL-M']}" style="width: 100%; height: 200px; object-fit: cover;">
-                <div class="book-title" title="{item['Book-Title']}">{item['Book-Title']}</div>
-                <div class="book-author">{item['Book-Author']}</div>
-                <div class="book-stats">
-                    {item['Year-Of-Publication']}
-                </div>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-
-def recommendations(df):
+def _card_html(title, author, stats, img):
+    # Shared by the recommendation and Top 50 grids.
+    # Books without a usable cover URL get a placeholder of the same size
+    cover = f'<img src="{img}" loading="lazy" decoding="async">' if img else '<div class="book-cover-placeholder">No cover</div>'
+    # Kept on one line so concatenated tiles are never mistaken for an indented markdown code block
+    return (
+        f"""<div class="book-card">"""
+        f"""{cover}"""
+        f"""<div class="book-title" title="{title}">{title}</div>"""
+        f"""<div class="book-author">{author}</div>"""
+        f"""<div class="book-stats">{stats}</div>"""
+        f"""</div>"""
+    )
+
+def _escape_html(values):
+    # Column-wise escaping for text placed in tile markup (including the quoted title attribute).
+    # Some titles already contain entities such as &lt; or &#160;, so '&' is left alone to avoid double escaping
+    return (
+        values.str.replace('<', '&lt;', regex=False)
+        .str.replace('>', '&gt;', regex=False)
+        .str.replace('"', '&quot;', regex=False)
+    )
+
+def _cover_urls(values):
+    # Keep only absolute http(s) cover URLs, checked for the whole column at once
+    urls = values.fillna('')
+    return _escape_html(urls.where(urls.str.startswith(('http://', 'https://')), ''))
+
+def _card_fields(df):
+    # Escaped titles/authors and cover URLs, extracted as arrays once per frame
+    titles = _escape_html(df['Book-Title']).to_numpy()
+    authors = _escape_html(df['Book-Author']).to_numpy()
+    urls = _cover_urls(df['Image-URL-M']).to_numpy()
+    return titles, authors, urls
+
+def selected_book_html(df):
+    # Larger card for the book the recommendations are based on (first row of df),
+    # escaped the same way as the grid tiles
+    book = df.iloc[0]
+    title, author, publisher = _escape_html(df[['Book-Title', 'Book-Author', 'Publisher']].iloc[0].fillna('').astype('string'))
+    img = _cover_urls(df['Image-URL-M']).iloc[0]
+    cover_style = 'width: 140px; height: 210px; object-fit: cover; box-shadow: 0 5px 15px rgba(0,0,0,0.5);'
+    cover = f'<img src="{img}" style="{cover_style}">' if img else f'<div class="book-cover-placeholder" style="{cover_style}">No cover</div>'
+    return (
+        f"""<div class="book-card" style="flex-direction: row; align-items: flex-start; text-align: left; padding: 25px; margin-bottom: 30px; gap: 20px;">"""
+        f"""{cover}"""
+        f"""<div style="flex: 1;">"""
+        f"""<h3 style="margin: 0 0 10px 0; font-size: 1.8rem; line-height: 1.2;">{title}</h3>"""
+        f"""<p style="color: #cbd5e1; font-size: 1.1rem; margin-bottom: 5px;"><strong>Author:</strong> {author}</p>"""
+        f"""<p style="color: #94a3b8; font-size: 0.95rem; margin-bottom: 5px;"><strong>Publisher:</strong> {publisher}</p>"""
+        f"""<p style="color: #94a3b8; font-size: 0.95rem;"><strong>Year:</strong> {book['Year-Of-Publication']}</p>"""
+        f"""</div>"""
+        f"""</div>"""
+    )
+
+# Result frames are at most a few dozen rows, so Streamlit's default DataFrame hashing is cheap
+@st.cache_data(max_entries=256, show_spinner=False)
+def _build_tiles(df):
+    # Memoized per result frame rather than per tile, so one cache lookup covers the whole grid
+    titles, authors, urls = _card_fields(df)
+    return list(map(_card_html, titles, authors, df['Year-Of-Publication'].to_numpy(), urls))
+
+def top_50_html(df):
+    # Same cards as the recommendations, with the rating summary in place of the year,
+    # in a 4-column CSS grid
+    titles, authors, urls = _card_fields(df)
+    stats = [
+        f"★ {rating:.1f} | {votes} Votes"
+        for rating, votes in zip(df['avg_rating'].to_numpy(), df['num_ratings'].to_numpy())
+    ]
+    cards = ''.join(map(_card_html, titles, authors, stats, urls))
+    return f'<div class="top50-grid">{cards}</div>'
+
+# Large grids render the first rows eagerly and the rest on demand
+EAGER_TILES = 20 # 4 rows of 5
+PAGE_TILES = 20
+
+def _grid_html(tiles):
+    return f'<div class="recommendation-grid">{"".join(tiles)}</div>'
+
+def _show_more(key):
+    st.session_state[key] += PAGE_TILES
+
+def _lazy_tiles(tiles, key):
+    # Paging restarts whenever a different set of results is shown
+    results_id = hash(tuple(tiles))
+    if st.session_state.get(f"{key}_results") != results_id:
+        st.session_state[f"{key}_results"] = results_id
+        st.session_state[key] = 0
+    shown = st.session_state[key]
+
+    if shown:
+        st.markdown(_grid_html(tiles[:shown]), unsafe_allow_html=True)
+    if shown < len(tiles):
+        st.button("Load more", key=f"{key}_more", on_click=_show_more, args=(key,))
+
+# A fragment, so interactions inside the grid (e.g. "Load more") rerun only the grid, not the whole app
+@st.fragment
+def recommendations(df, key='recommendations'):
     # check the number of items
     nbr_items = df.shape[0]
 
     if nbr_items != 0:    
         # Create a grid layout
-        # We'll display 5 items per row
-        cols_per_row = 5
-        rows = [df.iloc[i:i+cols_per_row] for i in range(0, nbr_items, cols_per_row)]
-
-        for row_df in rows:
-            columns = st.columns(cols_per_row)
-            items = row_df.to_dict(orient='records')
-            
-            # If the last row has fewer items, we zip only up to that length
-            for col, item in zip(columns, items):
-                tile_item(col, item)
+        # The CSS grid displays 5 items per row, so the whole grid goes out as one markdown element
+        # Unchanged results (e.g. after toggling an unrelated widget) reuse the cached tiles
+        tiles = _build_tiles(df)
+
+        st.markdown(_grid_html(tiles[:EAGER_TILES]), unsafe_allow_html=True)
+        if nbr_items > EAGER_TILES:
+            _lazy_tiles(tiles[EAGER_TILES:], f"{key}_shown")
     else:
         st.info("No recommendations available for this selection.") 
-